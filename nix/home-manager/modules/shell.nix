@@ -361,6 +361,9 @@ in
     executable = true;
   };
 
+  # Loaded by bin/claude-doctor from the same directory
+  home.file."bin/claude_doctor.py".source = ../files/scripts/claude_doctor.py;
+
   home.file."bin/check-upstream-issues" = {
     source = ../files/scripts/check-upstream-issues.py;
     executable = true;